@@ -0,0 +1,63 @@
+import math
+import numpy as np
+from numba import njit
+
+# Numeric kernels for the panchang endpoints, compiled with numba. They take
+# and return plain floats/ints so they can be called directly from main.py.
+
+# Start of Rahu Kaal as a fraction of daylight, Mon to Sun (0=Mon): the
+# (n-1)/8 offsets of the 7, 1, 6, 4, 5, 3, 2 octad sequence.
+RAHU_OFFSETS_FRAC = np.array([(i-1) / 8.0 for i in (7, 1, 6, 4, 5, 3, 2)], dtype=np.float64)
+OCTAD_FRAC = 1 / 8.0
+
+# NOAA solar calculator (Meeus): mean anomaly -> equation of centre ->
+# declination + equation of time -> solar noon -> sunrise hour angle.
+# Returns local-time hours, or NaN when the sun does not rise/set, so the
+# fastmath flags leave out "nnan".
+@njit(cache=True, fastmath={"nsz", "arcp", "contract", "afn", "reassoc"})
+def spa_sunrise_sunset(jd, lat, lon, tz):
+    jc = (jd - 2451545.0) / 36525.0
+    mean_long = (280.46646 + jc * (36000.76983 + jc * 0.0003032)) % 360.0
+    mean_anom = math.radians(357.52911 + jc * (35999.05029 - 0.0001537 * jc))
+    ecc = 0.016708634 - jc * (0.000042037 + 0.0000001267 * jc)
+    eq_ctr = (math.sin(mean_anom) * (1.914602 - jc * (0.004817 + 0.000014 * jc))
+              + math.sin(2 * mean_anom) * (0.019993 - 0.000101 * jc)
+              + math.sin(3 * mean_anom) * 0.000289)
+    omega = math.radians(125.04 - 1934.136 * jc)
+    app_long = math.radians(mean_long + eq_ctr - 0.00569 - 0.00478 * math.sin(omega))
+    mean_obliq = 23.0 + (26.0 + (21.448 - jc * (46.815 + jc * (0.00059 - jc * 0.001813))) / 60.0) / 60.0
+    obliq = math.radians(mean_obliq + 0.00256 * math.cos(omega))
+    decl = math.asin(math.sin(obliq) * math.sin(app_long))
+    y = math.tan(obliq / 2) ** 2
+    l0 = math.radians(mean_long)
+    eot = 4 * math.degrees(
+        y * math.sin(2 * l0) - 2 * ecc * math.sin(mean_anom)
+        + 4 * ecc * y * math.sin(mean_anom) * math.cos(2 * l0)
+        - 0.5 * y * y * math.sin(4 * l0) - 1.25 * ecc * ecc * math.sin(2 * mean_anom))
+    # Zenith of the disc centre with standard refraction, as BIT_DISC_CENTER.
+    lat_r = math.radians(lat)
+    cos_ha = (math.cos(math.radians(90.5667)) / (math.cos(lat_r) * math.cos(decl))
+              - math.tan(lat_r) * math.tan(decl))
+    if cos_ha < -1.0 or cos_ha > 1.0:
+        return math.nan, math.nan
+    ha = math.degrees(math.acos(cos_ha))
+    solar_noon = 720.0 - 4 * lon - eot + tz * 60
+    return (solar_noon - 4 * ha) / 60.0, (solar_noon + 4 * ha) / 60.0
+
+@njit(cache=True)
+def rahu_bounds(s_rise, s_set, weekday):
+    if s_set < s_rise:
+        s_set += 24
+    day_length = s_set - s_rise
+    rahu_start = s_rise + day_length * RAHU_OFFSETS_FRAC[weekday]
+    rahu_end = rahu_start + day_length * OCTAD_FRAC
+    return rahu_start, rahu_end
+
+@njit(cache=True)
+def tithi_index(sun_long, moon_long):
+    # 0-29 across both pakshas
+    return int(((moon_long - sun_long) % 360) / 12)
+
+@njit(cache=True)
+def nakshatra_index(moon_long):
+    return int(moon_long / (360/27))
@@ -1,12 +1,27 @@
-from fastapi import FastAPI, Query
+from fastapi import FastAPI, Header, Query, Response
 from fastapi.middleware.cors import CORSMiddleware
+import anyio
+import asyncio
 import datetime
+import functools
+import glob
+import hashlib
+import math
+import numpy as np
+import orjson
 import swisseph as swe
 import os
+from kernels import nakshatra_index, rahu_bounds, spa_sunrise_sunset, tithi_index
 
 # Set ephemeris path to 'ephe' subdirectory with absolute path
 swe.set_ephe_path(os.path.abspath("ephe"))
 
+# Sunrise/sunset come from the closed-form NOAA formula by default; set
+# PANCHANG_SWE_RISE_TRANS=1 to use Swiss Ephemeris rise_trans instead.
+USE_SWE_RISE_TRANS = os.environ.get("PANCHANG_SWE_RISE_TRANS") == "1"
+
+THREADPOOL_SIZE = int(os.environ.get("PANCHANG_THREADPOOL_SIZE", "100"))
+
 app = FastAPI(
     title="PanchangBodh API",
     description="Dynamic Daily Panchang API for any date/city. Powered by Swiss Ephemeris.",
@@ -21,116 +36,241 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-CITY_COORDS = {
-    "delhi": (28.6139, 77.2090),
-    "mumbai": (19.0760, 72.8777),
-    "kolkata": (22.5726, 88.3639),
-    "chennai": (13.0827, 80.2707),
-    "bengaluru": (12.9716, 77.5946),
-    "hyderabad": (17.3850, 78.4867),
-    "pune": (18.5204, 73.8567)
+# city key -> (lat, lon, display name)
+CITY_TABLE = {
+    "delhi": (28.6139, 77.2090, "Delhi"),
+    "mumbai": (19.0760, 72.8777, "Mumbai"),
+    "kolkata": (22.5726, 88.3639, "Kolkata"),
+    "chennai": (13.0827, 80.2707, "Chennai"),
+    "bengaluru": (12.9716, 77.5946, "Bengaluru"),
+    "hyderabad": (17.3850, 78.4867, "Hyderabad"),
+    "pune": (18.5204, 73.8567, "Pune")
 }
 DEFAULT_CITY = "delhi"
 
+TITHI_NAMES = (
+    "Pratipada", "Dvitiya", "Tritiya", "Chaturthi", "Panchami", "Shashthi",
+    "Saptami", "Ashtami", "Navami", "Dashami", "Ekadashi", "Dwadashi", "Trayodashi", "Chaturdashi", "Purnima/Amavasya"
+)
+NAK_NAMES = (
+    "Ashwini", "Bharani", "Krittika", "Rohini", "Mrigashirsha", "Ardra", "Punarvasu",
+    "Pushya", "Ashlesha", "Magha", "Purva Phalguni", "Uttara Phalguni", "Hasta",
+    "Chitra", "Swati", "Vishakha", "Anuradha", "Jyeshtha", "Mula", "Purva Ashadha",
+    "Uttara Ashadha", "Shravana", "Dhanishta", "Shatabhisha", "Purva Bhadrapada",
+    "Uttara Bhadrapada", "Revati"
+)
+WEEKDAY_NAMES = ("Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday")
+TITHI_NAMES_ARR = np.array(TITHI_NAMES)
+NAK_NAMES_ARR = np.array(NAK_NAMES)
+
+MAX_RANGE_DAYS = 366
+
+# Clock labels by hour of day (0-23)
+AMPM_TBL = tuple("AM" if h < 12 else "PM" for h in range(24))
+HOUR12_TBL = tuple(12 if h % 12 == 0 else h % 12 for h in range(24))
+
 def format_time_from_float(t):
-    hour = int(t)
-    minute = int(round((t - hour) * 60))
-    ampm = "AM" if hour < 12 or hour == 24 else "PM"
-    hour12 = hour % 12
-    hour12 = 12 if hour12 == 0 else hour12
-    return f"{hour12:02}:{minute:02} {ampm}"
+    # Round to whole minutes before splitting so 6:59.7 becomes 07:00, not
+    # 06:60; fold into one day since Rahu Kaal can end past midnight.
+    hour, minute = divmod(int(round(t * 60)), 60)
+    hour %= 24
+    return f"{HOUR12_TBL[hour]:02}:{minute:02} {AMPM_TBL[hour]}"
+
+# Swiss Ephemeris results depend only on (jd, lat, lon), so memoize the raw
+# floats; jd is rounded by callers so it is a stable cache key. Returns the
+# UT Julian days of the next rise and set after jd, or NaN when the sun is
+# circumpolar, so that case is cached too.
+@functools.lru_cache(maxsize=4096)
+def _sun_ut(jd, lat, lon):
+    geopos = (lon, lat, 0.0)
+    res_rise, tret_rise = swe.rise_trans(jd, swe.SUN, swe.CALC_RISE | swe.BIT_DISC_CENTER, geopos)
+    res_set, tret_set = swe.rise_trans(jd, swe.SUN, swe.CALC_SET | swe.BIT_DISC_CENTER, geopos)
+    if res_rise != 0 or res_set != 0:
+        return math.nan, math.nan
+    return tret_rise[0], tret_set[0]
+
+# Sun and Moon longitudes are always needed together, so one cache entry
+# per jd holds both and is shared by every endpoint.
+@functools.lru_cache(maxsize=4096)
+def _sun_moon_long(jd):
+    return swe.calc_ut(jd, swe.SUN)[0][0], swe.calc_ut(jd, swe.MOON)[0][0]
 
 def calculate_sun_times(lat, lon, year, month, day, timezone=5.5):
-    jd = swe.julday(year, month, day)
-    try:
-        sunrise_ut = swe.rise_trans(jd, swe.SUN, lon, lat, rsmi=swe.CALC_RISE | swe.BIT_DISC_CENTER)[1][0]
-        sunset_ut  = swe.rise_trans(jd, swe.SUN, lon, lat, rsmi=swe.CALC_SET | swe.BIT_DISC_CENTER)[1][0]
-    except Exception:
-        return ("N/A", "N/A")
-    sunrise = sunrise_ut + timezone
-    sunset  = sunset_ut + timezone
+    jd = round(swe.julday(year, month, day), 6)
+    if USE_SWE_RISE_TRANS:
+        # Search from local midnight so both events fall on the requested
+        # day, then turn the returned Julian days into local clock hours.
+        jd0 = round(swe.julday(year, month, day, 0.0) - timezone / 24, 6)
+        try:
+            sunrise_ut, sunset_ut = _sun_ut(jd0, lat, lon)
+        except Exception:
+            return ("N/A", "N/A", None, None)
+        if math.isnan(sunrise_ut) or math.isnan(sunset_ut):
+            return ("N/A", "N/A", None, None)
+        sunrise = (sunrise_ut - jd0) * 24
+        sunset  = (sunset_ut - jd0) * 24
+    else:
+        sunrise, sunset = spa_sunrise_sunset(jd, lat, lon, timezone)
+        if math.isnan(sunrise) or math.isnan(sunset):
+            return ("N/A", "N/A", None, None)
     if sunrise < 0: sunrise += 24
     if sunset < 0: sunset += 24
     if sunrise >= 24: sunrise -= 24
     if sunset >= 24: sunset -= 24
-    return format_time_from_float(sunrise), format_time_from_float(sunset)
+    return format_time_from_float(sunrise), format_time_from_float(sunset), sunrise, sunset
 
-def get_tithi(jd):
-    sun_long = swe.calc_ut(jd, swe.SUN)[0][0]
-    moon_long = swe.calc_ut(jd, swe.MOON)[0][0]
-    tithi_num = int(((moon_long - sun_long) % 360) / 12) + 1
+def get_tithi(tithi_num):
     paksha = "Shukla" if tithi_num <= 15 else "Krishna"
-    tithi_names = [
-        "Pratipada", "Dvitiya", "Tritiya", "Chaturthi", "Panchami", "Shashthi",
-        "Saptami", "Ashtami", "Navami", "Dashami", "Ekadashi", "Dwadashi", "Trayodashi", "Chaturdashi", "Purnima/Amavasya"
-    ]
     tithi_idx = (tithi_num-1) % 15
-    tithi_name = tithi_names[tithi_idx]
+    tithi_name = TITHI_NAMES[tithi_idx]
     return tithi_name, paksha
 
-def get_nakshatra(jd):
-    moon_long = swe.calc_ut(jd, swe.MOON)[0][0]
-    nak_num = int(moon_long / (360/27)) + 1
-    nak_names = [
-        "Ashwini", "Bharani", "Krittika", "Rohini", "Mrigashirsha", "Ardra", "Punarvasu",
-        "Pushya", "Ashlesha", "Magha", "Purva Phalguni", "Uttara Phalguni", "Hasta",
-        "Chitra", "Swati", "Vishakha", "Anuradha", "Jyeshtha", "Mula", "Purva Ashadha",
-        "Uttara Ashadha", "Shravana", "Dhanishta", "Shatabhisha", "Purva Bhadrapada",
-        "Uttara Bhadrapada", "Revati"
-    ]
-    nakshatra_name = nak_names[(nak_num-1) % 27]
+def get_nakshatra(nak_num):
+    nakshatra_name = NAK_NAMES[(nak_num-1) % 27]
     return nakshatra_name
 
-def get_rahu_kaal(weekday, sunrise, sunset):
-    rahu_sequence = [7, 1, 6, 4, 5, 3, 2]  # Mon to Sun (0=Mon)
-    start_index = rahu_sequence[weekday]
-    def time_to_float(t):
-        h, m, ampm = int(t[:2]), int(t[3:5]), t[-2:]
-        if ampm == "PM" and h != 12: h += 12
-        if ampm == "AM" and h == 12: h = 0
-        return h + m/60
-    s_rise = time_to_float(sunrise)
-    s_set = time_to_float(sunset)
-    if s_set < s_rise: s_set += 24
-    day_length = s_set - s_rise
-    rahu_start = s_rise + (day_length / 8) * (start_index-1)
-    rahu_end = rahu_start + (day_length / 8)
+# Per-date positions, keyed by "YYYY-MM-DD":
+# (jd, sun_long, moon_long, tithi_num, nak_num). Filled at startup for a
+# window around today and extended daily; misses fall back to live swe calls.
+DATE_CACHE = {}
+DATE_CACHE_DAYS = 365
+
+def get_date_positions(year, month, day):
+    jd = round(swe.julday(year, month, day), 6)
+    sun_long, moon_long = _sun_moon_long(jd)
+    tithi_num = tithi_index(sun_long, moon_long) + 1
+    nak_num = nakshatra_index(moon_long) + 1
+    return jd, sun_long, moon_long, tithi_num, nak_num
+
+def fill_date_cache(center):
+    for offset in range(-DATE_CACHE_DAYS, DATE_CACHE_DAYS + 1):
+        d = center + datetime.timedelta(days=offset)
+        key = d.isoformat()
+        if key not in DATE_CACHE:
+            DATE_CACHE[key] = get_date_positions(d.year, d.month, d.day)
+
+def get_rahu_kaal(weekday, s_rise, s_set):
+    rahu_start, rahu_end = rahu_bounds(s_rise, s_set, weekday)
     return format_time_from_float(rahu_start), format_time_from_float(rahu_end)
 
+def get_sun_fields(lat, lon, year, month, day, weekday):
+    sunrise, sunset, sunrise_f, sunset_f = calculate_sun_times(lat, lon, year, month, day)
+    if sunrise_f is None or sunset_f is None:
+        rahu_start, rahu_end = "N/A", "N/A"
+    else:
+        rahu_start, rahu_end = get_rahu_kaal(weekday, sunrise_f, sunset_f)
+    return sunrise, sunset, f"{rahu_start} – {rahu_end}"
+
+# One day of panchang output, shared by /api/panchang and /api/panchang/range
+# so both return the same fields. Tithi, paksha and nakshatra come in
+# precomputed because the range endpoint derives them for all days at once.
+def panchang_day(city_name, lat, lon, date, dt, tithi, paksha, nakshatra):
+    sunrise, sunset, rahu_kaal = get_sun_fields(lat, lon, dt.year, dt.month, dt.day, dt.weekday())
+    return {
+        "city": city_name,
+        "date": date,
+        "weekday": WEEKDAY_NAMES[dt.weekday()],
+        "sunrise": sunrise,
+        "sunset": sunset,
+        "tithi": tithi,
+        "paksha": paksha,
+        "nakshatra": nakshatra,
+        "rahu_kaal": rahu_kaal
+    }
+
+def _parse_iso(s):
+    # Fast path for the canonical YYYY-MM-DD form; anything else goes
+    # through strptime so the set of accepted inputs is unchanged.
+    if len(s) == 10 and s[4] == "-" and s[7] == "-":
+        digits = s[0:4] + s[5:7] + s[8:10]
+        if digits.isascii() and digits.isdigit():
+            return int(s[0:4]), int(s[5:7]), int(s[8:10])
+    dt = datetime.datetime.strptime(s, "%Y-%m-%d")
+    return dt.year, dt.month, dt.day
+
+def build_panchang(city_clean, date, lang):
+    lat, lon, city_name = CITY_TABLE.get(city_clean, CITY_TABLE[DEFAULT_CITY])
+    year, month, day = _parse_iso(date)
+    dt = datetime.date(year, month, day)
+    positions = DATE_CACHE.get(date)
+    if positions is None:
+        positions = get_date_positions(year, month, day)
+    jd, sun_long, moon_long, tithi_num, nak_num = positions
+    tithi, paksha = get_tithi(tithi_num)
+    nakshatra = get_nakshatra(nak_num)
+    return panchang_day(city_name, lat, lon, date, dt, tithi, paksha, nakshatra)
+
+# Output is a pure function of (city, date, lang): keep the encoded body and
+# its ETag so repeat requests skip both the calculation and JSON encoding.
+@functools.lru_cache(maxsize=8192)
+def _encoded(city_clean, date, lang):
+    content = orjson.dumps(build_panchang(city_clean, date, lang))
+    return content, f'"{hashlib.md5(content).hexdigest()}"'
+
+def _etag_matches(if_none_match, etag):
+    # If-None-Match uses weak comparison (RFC 7232 section 3.2), so a W/
+    # prefix added by a proxy or compression layer still matches.
+    if if_none_match.strip() == "*":
+        return True
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag == etag:
+            return True
+    return False
+
 @app.get("/api/panchang")
-async def panchang(
+def panchang(
     city: str = Query(DEFAULT_CITY),
     date: str = Query("2025-07-15"),
+    lang: str = Query("en"),
+    if_none_match: str = Header(None)
+):
+    try:
+        content, etag = _encoded(city.strip().lower(), date, lang)
+    except Exception as e:
+        return Response(content=orjson.dumps({"success": False, "error": str(e)}), media_type="application/json")
+    headers = {"Cache-Control": "public, max-age=86400", "ETag": etag}
+    if if_none_match and _etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=content, media_type="application/json", headers=headers)
+
+@app.get("/api/panchang/range")
+def panchang_range(
+    city: str = Query(DEFAULT_CITY),
+    start: str = Query(...),
+    end: str = Query(...),
     lang: str = Query("en")
 ):
+    # lang is accepted only to mirror /api/panchang; output is English either way
     try:
-        city_clean = city.strip().lower()
-        lat, lon = CITY_COORDS.get(city_clean, CITY_COORDS[DEFAULT_CITY])
-        city_name = city_clean.title() if city_clean in CITY_COORDS else DEFAULT_CITY.title()
-        dt = datetime.datetime.strptime(date, "%Y-%m-%d")
-        jd = swe.julday(dt.year, dt.month, dt.day)
-        sunrise, sunset = calculate_sun_times(lat, lon, dt.year, dt.month, dt.day)
-        if sunrise == "N/A" or sunset == "N/A":
-            rahu_start, rahu_end = "N/A", "N/A"
-        else:
-            rahu_start, rahu_end = get_rahu_kaal(dt.weekday(), sunrise, sunset)
-        tithi, paksha = get_tithi(jd)
-        nakshatra = get_nakshatra(jd)
-        weekday = dt.strftime("%A")
-        panchang = {
-            "city": city_name,
-            "date": date,
-            "weekday": weekday,
-            "sunrise": sunrise,
-            "sunset": sunset,
-            "tithi": tithi,
-            "paksha": paksha,
-            "nakshatra": nakshatra,
-            "rahu_kaal": f"{rahu_start} – {rahu_end}"
-        }
-        return panchang
+        lat, lon, city_name = CITY_TABLE.get(city.strip().lower(), CITY_TABLE[DEFAULT_CITY])
+        start_dt = datetime.date(*_parse_iso(start))
+        end_dt = datetime.date(*_parse_iso(end))
+        n_days = (end_dt - start_dt).days + 1
+        if n_days < 1:
+            raise ValueError("end must not be before start")
+        if n_days > MAX_RANGE_DAYS:
+            raise ValueError(f"range must not exceed {MAX_RANGE_DAYS} days")
+        jd0 = round(swe.julday(start_dt.year, start_dt.month, start_dt.day), 6)
+        jds = jd0 + np.arange(n_days, dtype=np.float64)
+        suns = np.empty(n_days, dtype=np.float64)
+        moons = np.empty(n_days, dtype=np.float64)
+        for i in range(n_days):
+            suns[i], moons[i] = _sun_moon_long(float(jds[i]))
+        tithi_nums = (((moons - suns) % 360) / 12).astype(np.int64) + 1
+        nak_nums = (moons / (360/27)).astype(np.int64) + 1
+        tithis = TITHI_NAMES_ARR[(tithi_nums-1) % 15].tolist()
+        pakshas = np.where(tithi_nums <= 15, "Shukla", "Krishna").tolist()
+        nakshatras = NAK_NAMES_ARR[(nak_nums-1) % 27].tolist()
+        days = []
+        for i in range(n_days):
+            dt = start_dt + datetime.timedelta(days=i)
+            days.append(panchang_day(city_name, lat, lon, dt.isoformat(), dt, tithis[i], pakshas[i], nakshatras[i]))
+        return Response(content=orjson.dumps(days), media_type="application/json")
     except Exception as e:
-        return {"success": False, "error": str(e)}
+        return Response(content=orjson.dumps({"success": False, "error": str(e)}), media_type="application/json")
 
 @app.get("/api/debug/files")
 def list_ephe_files():
@@ -152,6 +292,43 @@ def print_ephe_debug():
     except Exception as ex:
         print(f"Startup: Could not list .se1 files: {ex}")
 
+@app.on_event("startup")
+def preload_ephe_files():
+    # Read every .se1 file once so it sits in the OS page cache, then make one
+    # calc_ut call so swisseph opens the files and loads its internal tables.
+    ephe_path = os.path.abspath("ephe")
+    total = 0
+    for path in glob.glob(os.path.join(ephe_path, "*.se1")):
+        with open(path, "rb") as f:
+            while chunk := f.read(1 << 20):
+                total += len(chunk)
+    swe.calc_ut(swe.julday(2025, 1, 1), swe.SUN)
+    print(f"Startup: Preloaded {total} bytes of ephemeris data")
+
+async def extend_date_cache():
+    while True:
+        await asyncio.sleep(24 * 60 * 60)
+        fill_date_cache(datetime.date.today())
+
+@app.on_event("startup")
+async def raise_threadpool_limit():
+    # Sync routes run on anyio's threadpool, which defaults to 40 threads
+    anyio.to_thread.current_default_thread_limiter().total_tokens = THREADPOOL_SIZE
+
+@app.on_event("startup")
+def warm_jit():
+    # Compile the numba kernels before the first request arrives
+    spa_sunrise_sunset(2451545.0, 0.0, 0.0, 0.0)
+    rahu_bounds(6.0, 18.0, 0)
+    tithi_index(0.0, 0.0)
+    nakshatra_index(0.0)
+
+@app.on_event("startup")
+async def build_date_cache():
+    fill_date_cache(datetime.date.today())
+    print(f"Startup: Precomputed positions for {len(DATE_CACHE)} dates")
+    app.state.date_cache_task = asyncio.create_task(extend_date_cache())
+
 @app.get("/")
 def root():
     return {